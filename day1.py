@@ -1,4 +1,10 @@
-from typing import Dict
+import mmap
+import os
+import string
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Dict, List, Optional, Tuple
 
 NUMBERS: Dict[str, str] = {
     "one": "1",
@@ -30,19 +36,127 @@ def find_number(chars: str, reversed_string: bool = False) -> str:
                 return v
 
 
+def build_matcher(
+    patterns: Dict[str, str]
+) -> Tuple[List[Dict[str, int]], List[List[Tuple[int, str]]]]:
+    """
+    Aho-Corasick automaton over every pattern, compiled down to a full transition table.
+    Any character that doesn't appear in a pattern just falls back to the root (state 0).
+    :param patterns: text to match -> value reported for the match
+    :return: transitions per state, and the (pattern length, value) outputs per state.
+    """
+    transitions: List[Dict[str, int]] = [{}]
+    outputs: List[List[Tuple[int, str]]] = [[]]
+    for pattern, value in patterns.items():
+        state = 0
+        for char in pattern:
+            if char not in transitions[state]:
+                transitions.append({})
+                outputs.append([])
+                transitions[state][char] = len(transitions) - 1
+            state = transitions[state][char]
+        outputs[state].append((len(pattern), value))
+
+    # breadth first, so a state's failure link is always resolved before its children.
+    fail = [0] * len(transitions)
+    queue = deque(transitions[0].values())
+    while queue:
+        state = queue.popleft()
+        for char, child in transitions[state].items():
+            queue.append(child)
+            fallback = fail[state]
+            while fallback and char not in transitions[fallback]:
+                fallback = fail[fallback]
+            fail[child] = transitions[fallback].get(char, 0) if state else 0
+            outputs[child] = outputs[child] + outputs[fail[child]]
+
+    # fill in the missing edges so a scan never has to chase failure links.
+    alphabet = set("".join(patterns))
+    queue = deque([0])
+    while queue:
+        state = queue.popleft()
+        for char in alphabet:
+            if char in transitions[state]:
+                queue.append(transitions[state][char])
+            elif state:
+                transitions[state][char] = transitions[fail[state]].get(char, 0)
+    return transitions, outputs
+
+
+TRANSITIONS, OUTPUTS = build_matcher(
+    {**NUMBERS, **{digit: digit for digit in string.digits}}
+)
+
+
+def find_calibration_value(line: str) -> int:
+    # one forward scan, keeping the matches that start earliest and latest.
+    # overlapping words are fine: "eightwo" reports eight, then two.
+    state = 0
+    first, last = None, None
+    first_start, last_start = len(line), -1
+    for i, char in enumerate(line):
+        state = TRANSITIONS[state].get(char, 0)
+        for length, value in OUTPUTS[state]:
+            start = i - length + 1
+            if start < first_start:
+                first, first_start = value, start
+            if start > last_start:
+                last, last_start = value, start
+    return int(first + last)
+
+
 def evaluate_file(filename: str) -> int:
+    total = 0
     with open(filename, "r") as fp:
-        lines = [line.rstrip() for line in fp]
+        for line in fp:
+            total += find_calibration_value(line.rstrip())
 
-    total = 0
-    for line in lines:
-        first = find_number(line)
-        last = find_number(line[::-1], reversed_string=True)
-        total += int(first + last)
+    return total
+
+
+def find_chunk_bounds(filename: str, chunk_size: int) -> List[Tuple[int, int]]:
+    """
+    split the file into byte ranges of roughly chunk_size, each ending just after a newline
+    so that no line is ever cut in half.
+    """
+    bounds = []
+    with open(filename, "rb") as fp:
+        size = os.fstat(fp.fileno()).st_size
+        if size == 0:
+            return bounds
+        with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            start = 0
+            while start < size:
+                newline = mapped.find(b"\n", min(start + chunk_size, size) - 1)
+                end = size if newline == -1 else newline + 1
+                bounds.append((start, end))
+                start = end
+    return bounds
 
+
+def evaluate_chunk(filename: str, start: int, end: int) -> int:
+    total = 0
+    with open(filename, "rb") as fp:
+        with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            mapped.seek(start)
+            while mapped.tell() < end:
+                line = mapped.readline().decode()
+                total += find_calibration_value(line.rstrip())
     return total
 
 
+def evaluate_file_parallel(
+    filename: str, workers: Optional[int] = None, chunk_size: int = 1 << 24
+) -> int:
+    # same total as evaluate_file, but each worker memory-maps its own newline aligned chunk.
+    bounds = find_chunk_bounds(filename=filename, chunk_size=chunk_size)
+    if not bounds:
+        return 0
+    starts, ends = zip(*bounds)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return sum(executor.map(evaluate_chunk, repeat(filename), starts, ends))
+
+
 if __name__ == "__main__":
     filename = "data/day1"
     print(evaluate_file(filename=filename))
@@ -1,10 +1,15 @@
-from typing import List, Dict, Any
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import List, Dict, Any, Iterable, Iterator, Tuple
 from typing import NamedTuple
 from operator import mul
 from functools import reduce
 
 
 MAXES = {"red": 12, "green": 13, "blue": 14}
+# interned colors, so a game can be reduced to a short list of maxima indexed by color id.
+COLORS: List[str] = list(MAXES)
+COLOR_IDS: Dict[str, int] = {color: i for i, color in enumerate(COLORS)}
 
 
 class Cube(NamedTuple):
@@ -65,6 +70,131 @@ def get_pulls(game_text: str) -> List[List[Cube]]:
     return pulls
 
 
+def intern_color(color: str) -> int:
+    color_id = COLOR_IDS.get(color)
+    if color_id is None:
+        color_id = COLOR_IDS[color] = len(COLORS)
+        COLORS.append(color)
+    return color_id
+
+
+def stream_game_maxima(lines: Iterable[str]) -> Iterator[Tuple[int, List[int]]]:
+    """
+    reduce each game straight to the most cubes pulled per color id, without building Cubes.
+    colors that never show up in a game are left at -1.
+    :param lines: "Game 1: 7 green, 14 red, 5 blue; 8 red, 4 green"
+    :return: game id and the per-color maxima.
+    """
+    for line in lines:
+        line = line.rstrip()
+        if not line:
+            continue
+        game_id_text, content = line.split(": ")
+        maxima = [-1] * len(COLORS)
+        for cube_details in content.replace("; ", ", ").split(", "):
+            count, color = cube_details.split(" ")
+            color_id = intern_color(color)
+            if color_id >= len(maxima):
+                maxima.extend([-1] * (len(COLORS) - len(maxima)))
+            if int(count) > maxima[color_id]:
+                maxima[color_id] = int(count)
+        yield int(game_id_text.split(" ")[1]), maxima
+
+
+def evaluate_games_streaming(filename: str) -> Tuple[int, int]:
+    # both answers in one lazy pass. evaluate_games is kept around as the reference.
+    possible_total = 0
+    power_total = 0
+    limits: List[int] = []
+    with open(filename, "r") as file:
+        for game_id, maxima in stream_game_maxima(file):
+            while len(limits) < len(maxima):
+                limits.append(MAXES.get(COLORS[len(limits)], 0))
+            if all(count <= limit for count, limit in zip(maxima, limits)):
+                possible_total += game_id
+            power_total += reduce(mul, (count for count in maxima if count >= 0), 1)
+
+    return possible_total, power_total
+
+
+class GameIndex(NamedTuple):
+    """
+    per-game color maxima, folded into a dominance table so any bag configuration
+    can be answered without touching the game log again.
+    totals is a flattened prefix sum over the distinct maxima of every color:
+    the cell at (i, j, k) holds the sum of game ids whose maxima are all <= (thresholds[0][i], ...).
+    the table grows with the product of distinct maxima per color, not the number of games.
+    """
+
+    colors: List[str]
+    thresholds: List[List[int]]
+    totals: array
+
+    @classmethod
+    def from_file(cls, filename: str):
+        game_ids = array("q")
+        flat_maxima = array("q")
+        width = len(COLORS)
+        with open(filename, "r") as file:
+            for game_id, maxima in stream_game_maxima(file):
+                if len(COLORS) > width:
+                    # a new color showed up, pad out every game read so far.
+                    padding = [0] * (len(COLORS) - width)
+                    flat_maxima = array(
+                        "q",
+                        [
+                            count
+                            for n in range(len(game_ids))
+                            for count in [*flat_maxima[n * width : (n + 1) * width], *padding]
+                        ],
+                    )
+                    width = len(COLORS)
+                game_ids.append(game_id)
+                # a color missing from a game counts as 0 cubes.
+                flat_maxima.extend(max(count, 0) for count in maxima)
+                flat_maxima.extend([0] * (width - len(maxima)))
+        return cls.from_maxima(colors=list(COLORS), game_ids=game_ids, flat_maxima=flat_maxima)
+
+    @classmethod
+    def from_maxima(cls, colors: List[str], game_ids: array, flat_maxima: array):
+        width = len(colors)
+        thresholds = [sorted(set(flat_maxima[i::width])) for i in range(width)]
+        shape = [len(values) for values in thresholds]
+        strides = [reduce(mul, shape[i + 1 :], 1) for i in range(width)]
+        totals = array("q", [0]) * reduce(mul, shape, 1)
+        for n, game_id in enumerate(game_ids):
+            cell = 0
+            for i in range(width):
+                cell += strides[i] * bisect_left(thresholds[i], flat_maxima[n * width + i])
+            totals[cell] += game_id
+
+        # running sum along one color axis at a time turns the counts into dominance sums.
+        for axis in range(width):
+            stride = strides[axis]
+            for cell in range(len(totals)):
+                if (cell // stride) % shape[axis]:
+                    totals[cell] += totals[cell - stride]
+        return cls(colors=colors, thresholds=thresholds, totals=totals)
+
+    def possible_total(self, limits: Dict[str, int]) -> int:
+        # same answer as summing game ids that pass is_possible with limits in place of MAXES.
+        if not self.totals:
+            # no games, so nothing to add up.
+            return 0
+        cell = 0
+        stride = len(self.totals)
+        for color, values in zip(self.colors, self.thresholds):
+            stride //= len(values)
+            position = bisect_right(values, limits.get(color, 0)) - 1
+            if position < 0:
+                return 0
+            cell += stride * position
+        return self.totals[cell]
+
+    def possible_totals(self, queries: Iterable[Dict[str, int]]) -> List[int]:
+        return [self.possible_total(limits) for limits in queries]
+
+
 if __name__ == "__main__":
     print(evaluate_games(filename="data/day2", mode="is_possible"))
     print(evaluate_games(filename="data/day2", mode="min_cubes"))
@@ -7,8 +7,10 @@ find positions of symbols, then search in 8 directions for a number
 if we find a number, walk left and right to assemble full number.
 stop when we reach a non-numeric character.
 """
+import re
 import string
-from typing import List, Tuple
+from collections import deque
+from typing import Deque, Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
 
 DIRECTIONS = (
     (0, 1),  # up
@@ -23,6 +25,16 @@ DIRECTIONS = (
 NON_SYMBOLS = set("." + string.digits)
 GEAR_RATIO_ADJACENCY_COUNT = 2
 
+# byte translation tables, so a whole row becomes one byte-per-cell flag string in a single call.
+SYMBOL_FLAGS = bytes(0 if chr(i) in NON_SYMBOLS else 1 for i in range(256))
+DIGIT_FLAGS = bytes(1 if chr(i) in string.digits else 0 for i in range(256))
+# a digit next to a symbol is shifted up into a-j, so its run can be picked out by a regex.
+NEAR_SYMBOL_SHIFT = ord("a") - ord("0")
+PART_NUMBER = re.compile(rb"[0-9]*[a-j][0-9a-j]*")
+SHIFTED_DIGITS = bytes.maketrans(b"abcdefghij", b"0123456789")
+GEAR = re.compile(rb"\*")
+DIGIT_RUN = re.compile(rb"[0-9]+")
+
 
 def get_part_number_positions(line: str, position: int) -> (int, int):
     """
@@ -103,6 +115,301 @@ def find_gear_ratio(lines: List[str]) -> int:
     return total
 
 
+def cell_flags(row: bytes, flags: bytes) -> int:
+    # one byte per cell, little endian, so shifting by 8 bits moves a whole column.
+    return int.from_bytes(row.translate(flags), "little")
+
+
+def dilate(cells: List[int]) -> List[int]:
+    # grow every flagged cell into its 3x3 neighborhood.
+    # rows are expected to carry a border column, so nothing shifts off either end.
+    horizontal = [cell | (cell << 8) | (cell >> 8) for cell in cells]
+    padded = [0, *horizontal, 0]
+    return [padded[y] | padded[y + 1] | padded[y + 2] for y in range(len(cells))]
+
+
+def row_part_numbers(row: bytes, row_digits: bytes, near: int) -> List[int]:
+    """
+    :param row: the row's cells, framed by a border column.
+    :param row_digits: a byte per cell, 1 for digits.
+    :param near: a byte per cell, nonzero next to a symbol.
+    :return: every number in the row that touches a symbol.
+    """
+    # no carries: a digit plus the shift still fits in its own byte.
+    marked = int.from_bytes(row, "little") + (
+        near & int.from_bytes(row_digits, "little")
+    ) * NEAR_SYMBOL_SHIFT
+    part_numbers = PART_NUMBER.findall(marked.to_bytes(len(row), "little"))
+    return list(map(int, b" ".join(part_numbers).translate(SHIFTED_DIGITS).split()))
+
+
+def gear_ratio(x: int, y: int, rows: List[bytes], digits: List[bytes]) -> Optional[int]:
+    """
+    :param x: column of a gear in rows[y], rows are bordered so y has a row above and below.
+    :return: the gear ratio, or None if the gear doesn't touch exactly two numbers.
+    """
+    spans = []
+    for number_y in (y - 1, y, y + 1):
+        row_digits = digits[number_y]
+        if row_digits[x]:
+            spans.append((number_y, row_digits.rfind(0, 0, x) + 1, row_digits.find(0, x)))
+            continue
+        if row_digits[x - 1]:
+            spans.append((number_y, row_digits.rfind(0, 0, x - 1) + 1, x))
+        if row_digits[x + 1]:
+            spans.append((number_y, x + 1, row_digits.find(0, x + 1)))
+
+    if len(spans) != GEAR_RATIO_ADJACENCY_COUNT:
+        return None
+    number = 1
+    for number_y, start, end in spans:
+        number *= int(rows[number_y][start:end])
+    return number
+
+
+def find_totals_vectorized(lines: List[str]) -> Tuple[int, int]:
+    """
+    alternate engine for find_part_number_total and find_gear_ratio.
+    every row is held as one integer with a byte per cell, so the symbol mask and its
+    8 neighbor dilation are a few whole-row shifts and ors, and part numbers are picked out
+    with a regex instead of probing neighbors cell by cell.
+    the grid is padded with a border of periods, so no lookup can wrap around or run off the end.
+    every number next to a gear counts towards that gear, even if it also touches another one.
+    :return: part number total and gear ratio total.
+    """
+    width = max((len(line) for line in lines), default=0) + 2
+    border = b"." * width
+    rows = [border, *(b"." + line.encode().ljust(width - 1, b".") for line in lines), border]
+    digits = [row.translate(DIGIT_FLAGS) for row in rows]
+    near_symbol = dilate([cell_flags(row, SYMBOL_FLAGS) for row in rows])
+
+    part_total = 0
+    for row, row_digits, near in zip(rows, digits, near_symbol):
+        part_total += sum(row_part_numbers(row, row_digits, near))
+
+    gear_total = 0
+    for y in range(1, len(rows) - 1):
+        for gear in GEAR.finditer(rows[y]):
+            gear_total += gear_ratio(gear.start(), y, rows, digits) or 0
+    return part_total, gear_total
+
+
+class SchematicRow(NamedTuple):
+    # a row framed by a period on each side, so lookups never wrap around or run off the end.
+    cells: bytes
+    digits: bytes
+    # symbol cells spread one column left and right, one byte per cell.
+    near_symbol: int
+
+
+def prepare_row(line: str, width: int) -> SchematicRow:
+    cells = b"." + line.encode().ljust(width + 1, b".")
+    symbols = cell_flags(cells, SYMBOL_FLAGS)
+    return SchematicRow(
+        cells=cells,
+        digits=cells.translate(DIGIT_FLAGS),
+        near_symbol=symbols | (symbols << 8) | (symbols >> 8),
+    )
+
+
+def evaluate_window(
+    above: SchematicRow, row: SchematicRow, below: SchematicRow
+) -> Tuple[List[int], List[int]]:
+    """
+    everything that can be settled for the middle row once its neighbors are known.
+    :return: part numbers in the row and gear ratios for gears in the row.
+    """
+    near = above.near_symbol | row.near_symbol | below.near_symbol
+    part_numbers = row_part_numbers(row.cells, row.digits, near)
+
+    cells = [above.cells, row.cells, below.cells]
+    digits = [above.digits, row.digits, below.digits]
+    gear_ratios = []
+    for gear in GEAR.finditer(row.cells):
+        ratio = gear_ratio(gear.start(), 1, cells, digits)
+        if ratio is not None:
+            gear_ratios.append(ratio)
+    return part_numbers, gear_ratios
+
+
+def stream_schematic(
+    lines: Iterable[str], width: Optional[int] = None
+) -> Iterator[Tuple[List[int], List[int]]]:
+    """
+    only a sliding window of three rows is held, so memory follows the width, not the height.
+    each row's part numbers and gear ratios are yielded as soon as the row below it is read.
+    :param width: every row is padded out to this, defaults to the width of the first row.
+    """
+    window: Deque[SchematicRow] = deque(maxlen=3)
+    for line in lines:
+        line = line.rstrip()
+        if width is None:
+            width = len(line)
+        if len(line) > width:
+            raise ValueError(f"row is wider than the schematic: {len(line)} > {width}")
+        if not window:
+            window.append(prepare_row("", width))
+        window.append(prepare_row(line, width))
+        if len(window) == 3:
+            yield evaluate_window(*window)
+
+    if len(window) > 1:
+        yield evaluate_window(window[-2], window[-1], prepare_row("", width))
+
+
+def find_totals_streaming(filename: str) -> Tuple[int, int]:
+    # both totals from a single pass, without ever holding the whole schematic.
+    part_total, gear_total = 0, 0
+    with open(filename, "r") as file:
+        for part_numbers, gear_ratios in stream_schematic(file):
+            part_total += sum(part_numbers)
+            gear_total += sum(gear_ratios)
+    return part_total, gear_total
+
+
+class PartNumber(NamedTuple):
+    y: int
+    start: int
+    end: int  # exclusive
+    value: int
+
+
+class SchematicIndex:
+    """
+    persistent index of a schematic, so small edits don't need a full rescan.
+    every digit cell points at the id of its number, every number keeps its span and
+    the symbols around it, and every symbol keeps the ids of the numbers around it.
+    an edit only revisits the numbers and symbols around the changed cell, and keeps
+    part_total and gear_total current.
+    positions are (y, x), the same way find_part_number_total tracks visited cells.
+    """
+
+    def __init__(self, lines: List[str]):
+        self.rows = [bytearray(line.rstrip().encode()) for line in lines]
+        self.numbers: Dict[int, PartNumber] = {}
+        self.number_ids: Dict[Tuple[int, int], int] = {}
+        self.number_symbols: Dict[int, Set[Tuple[int, int]]] = {}
+        self.symbol_numbers: Dict[Tuple[int, int], Set[int]] = {}
+        self.gear_ratios: Dict[Tuple[int, int], int] = {}
+        self.part_total = 0
+        self.gear_total = 0
+        self.next_id = 0
+
+        for y, row in enumerate(self.rows):
+            for x, cell in enumerate(row):
+                if SYMBOL_FLAGS[cell]:
+                    self.symbol_numbers[(y, x)] = set()
+        for y, row in enumerate(self.rows):
+            for match in DIGIT_RUN.finditer(row):
+                self.add_number(y, match.start())
+        for position in self.symbol_numbers:
+            self.update_gear(position)
+
+    @classmethod
+    def from_file(cls, filename: str):
+        with open(filename, "r") as file:
+            return cls(lines=list(file))
+
+    def neighborhood(self, y: int, start: int, end: int) -> Iterator[Tuple[int, int]]:
+        # every in-bounds cell touching the span [start, end) of row y, the span included.
+        for new_y in range(max(y - 1, 0), min(y + 2, len(self.rows))):
+            for new_x in range(max(start - 1, 0), min(end + 1, len(self.rows[new_y]))):
+                yield new_y, new_x
+
+    def add_number(self, y: int, x: int) -> Set[Tuple[int, int]]:
+        # index the digit run covering (y, x), returns the symbols it touches.
+        row = self.rows[y]
+        start, end = x, x + 1
+        while start > 0 and DIGIT_FLAGS[row[start - 1]]:
+            start -= 1
+        while end < len(row) and DIGIT_FLAGS[row[end]]:
+            end += 1
+        number = PartNumber(y=y, start=start, end=end, value=int(row[start:end]))
+
+        number_id = self.next_id
+        self.next_id += 1
+        self.numbers[number_id] = number
+        for i in range(start, end):
+            self.number_ids[(y, i)] = number_id
+        symbols = {
+            position
+            for position in self.neighborhood(y, start, end)
+            if position in self.symbol_numbers
+        }
+        for position in symbols:
+            self.symbol_numbers[position].add(number_id)
+        self.number_symbols[number_id] = symbols
+        if symbols:
+            self.part_total += number.value
+        return symbols
+
+    def remove_number(self, number_id: int) -> Set[Tuple[int, int]]:
+        # drop a number from the index, returns the symbols it used to touch.
+        number = self.numbers.pop(number_id)
+        for i in range(number.start, number.end):
+            del self.number_ids[(number.y, i)]
+        symbols = self.number_symbols.pop(number_id)
+        for position in symbols:
+            self.symbol_numbers[position].discard(number_id)
+        if symbols:
+            self.part_total -= number.value
+        return symbols
+
+    def update_gear(self, position: Tuple[int, int]) -> None:
+        self.gear_total -= self.gear_ratios.pop(position, 0)
+        y, x = position
+        number_ids = self.symbol_numbers.get(position, ())
+        if self.rows[y][x] == ord("*") and len(number_ids) == GEAR_RATIO_ADJACENCY_COUNT:
+            ratio = 1
+            for number_id in number_ids:
+                ratio *= self.numbers[number_id].value
+            self.gear_ratios[position] = ratio
+            self.gear_total += ratio
+
+    def part_numbers_at(self, x: int, y: int) -> List[int]:
+        # part numbers touching the symbol at (x, y), empty if there's no symbol there.
+        return [
+            self.numbers[number_id].value
+            for number_id in self.symbol_numbers.get((y, x), ())
+        ]
+
+    def set_cell(self, x: int, y: int, char: str) -> None:
+        """
+        replace a single cell. only the numbers with a cell in the surrounding 3x3 can change
+        shape or adjacency, so those are unindexed and indexed again along with the symbols
+        they touch. the work depends on the size of those numbers, not the grid.
+        """
+        if not (0 <= y < len(self.rows) and 0 <= x < len(self.rows[y])):
+            raise IndexError(f"({x}, {y}) is outside the schematic")
+        position = (y, x)
+        number_ids = {
+            self.number_ids[cell]
+            for cell in self.neighborhood(y, x, x + 1)
+            if cell in self.number_ids
+        }
+
+        touched_symbols = set()
+        digit_cells = [position]
+        for number_id in number_ids:
+            number = self.numbers[number_id]
+            digit_cells.extend((number.y, i) for i in range(number.start, number.end))
+            touched_symbols |= self.remove_number(number_id)
+        if position in self.symbol_numbers:
+            del self.symbol_numbers[position]
+            touched_symbols.add(position)
+
+        self.rows[y][x] = ord(char)
+        if SYMBOL_FLAGS[self.rows[y][x]]:
+            self.symbol_numbers[position] = set()
+            touched_symbols.add(position)
+
+        for cell_y, cell_x in digit_cells:
+            if DIGIT_FLAGS[self.rows[cell_y][cell_x]] and (cell_y, cell_x) not in self.number_ids:
+                touched_symbols |= self.add_number(cell_y, cell_x)
+        for symbol in touched_symbols:
+            self.update_gear(symbol)
+
+
 if __name__ == "__main__":
     filename = "data/day3"
     with open(filename, "r") as file:
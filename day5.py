@@ -1,4 +1,9 @@
-from typing import Dict, List, NamedTuple, Tuple, Optional, Union
+import json
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from bisect import bisect_left, bisect_right, insort
+from itertools import repeat
+from typing import Dict, Iterable, List, NamedTuple, Tuple, Optional, Union
 
 
 class Map(NamedTuple):
@@ -68,6 +73,102 @@ class SeedMap(NamedTuple):
         return cls(**categories)
 
 
+class Interval(NamedTuple):
+    start: int
+    end: int
+    offset: int
+
+
+def fill_gaps(maps: List[Map], upper_bound: int) -> List[Interval]:
+    # every source in [0, upper_bound) lands in exactly one interval, gaps map to themselves.
+    intervals = []
+    position = 0
+    for map in maps:
+        if position < map.source_start:
+            intervals.append(Interval(start=position, end=map.source_start, offset=0))
+        intervals.append(
+            Interval(
+                start=map.source_start,
+                end=map.source_end,
+                offset=map.destination_start - map.source_start,
+            )
+        )
+        position = map.source_end
+    if position < upper_bound:
+        intervals.append(Interval(start=position, end=upper_bound, offset=0))
+    return intervals
+
+
+def find_upper_bound(seed_map: SeedMap) -> int:
+    # no map can move a value at or past this, and no map sends a value there.
+    return max(
+        (
+            max(map.source_end, map.destination_end)
+            for category in seed_map
+            for map in category
+        ),
+        default=0,
+    )
+
+
+def compose(first: List[Interval], second: List[Interval]) -> List[Interval]:
+    """
+    apply first, then second, as a single gap-filled table over first's sources.
+    intervals that end up next to each other with the same offset are merged.
+    """
+    second_starts = [interval.start for interval in second]
+    composed: List[Interval] = []
+    for interval in first:
+        start = interval.start
+        i = bisect_right(second_starts, start + interval.offset) - 1
+        while start < interval.end:
+            target = second[i]
+            end = min(interval.end, target.end - interval.offset)
+            offset = interval.offset + target.offset
+            if composed and composed[-1].end == start and composed[-1].offset == offset:
+                composed[-1] = composed[-1]._replace(end=end)
+            else:
+                composed.append(Interval(start=start, end=end, offset=offset))
+            start = end
+            i += 1
+    return composed
+
+
+class CompiledSeedMap(NamedTuple):
+    """
+    every SeedMap category folded into one sorted table, so a seed is a single bisect away
+    from its location no matter how many categories or maps there are.
+    the table covers [0, intervals[-1].end), everything past that can't be moved by any map.
+    """
+
+    intervals: List[Interval]
+    starts: List[int]
+
+    @classmethod
+    def compile(cls, seed_map: SeedMap):
+        upper_bound = find_upper_bound(seed_map)
+        intervals = [Interval(start=0, end=upper_bound, offset=0)] if upper_bound else []
+        for category in seed_map:
+            intervals = compose(intervals, fill_gaps(category, upper_bound))
+        return cls(intervals=intervals, starts=[interval.start for interval in intervals])
+
+    @classmethod
+    def load(cls, filename: str):
+        with open(filename, "r") as file:
+            intervals = [Interval(*interval) for interval in json.load(file)]
+        return cls(intervals=intervals, starts=[interval.start for interval in intervals])
+
+    def save(self, filename: str) -> None:
+        with open(filename, "w") as file:
+            json.dump([list(interval) for interval in self.intervals], file)
+
+    def find_location_number(self, seed: int) -> int:
+        i = bisect_right(self.starts, seed) - 1
+        if i < 0 or seed >= self.intervals[i].end:
+            return seed
+        return seed + self.intervals[i].offset
+
+
 def find_location_number(seed: int, seed_map: SeedMap) -> int:
     _source = seed
     for categories in seed_map:
@@ -157,6 +258,344 @@ def get_lowest(seed_range: Bound, seed_map: SeedMap) -> int:
     return sorted(unmapped_ranges, key=lambda unmapped_range: unmapped_range.start)[0].start
 
 
+def coalesce(bounds: List[Bound]) -> List[Bound]:
+    # sorted, with overlapping and touching bounds merged, so the count can't blow up.
+    merged: List[Bound] = []
+    for bound in sorted(bounds):
+        if merged and bound.start <= merged[-1].end:
+            if bound.end > merged[-1].end:
+                merged[-1] = Bound(start=merged[-1].start, end=bound.end)
+        elif bound.start < bound.end:
+            merged.append(bound)
+    return merged
+
+
+def sweep_category(bounds: List[Bound], intervals: List[Interval]) -> List[Bound]:
+    """
+    push coalesced bounds through one gap-filled category in a single merge-style pass.
+    anything outside the intervals maps to itself.
+    """
+    mapped: List[Bound] = []
+    i = 0
+    for bound in bounds:
+        start = bound.start
+        while i < len(intervals) and intervals[i].end <= start:
+            i += 1
+        j = i
+        while start < bound.end:
+            if j == len(intervals) or start < intervals[j].start:
+                end = bound.end if j == len(intervals) else min(bound.end, intervals[j].start)
+                mapped.append(Bound(start=start, end=end))
+            else:
+                end = min(bound.end, intervals[j].end)
+                offset = intervals[j].offset
+                mapped.append(Bound(start=start + offset, end=end + offset))
+                j += 1
+            start = end
+    return mapped
+
+
+def find_lowest_location(seed_ranges: List[Bound], seed_map: SeedMap) -> Optional[int]:
+    """
+    same answer as taking the smallest get_lowest over every range, but all ranges
+    move through each category together and are coalesced in between.
+    """
+    upper_bound = find_upper_bound(seed_map)
+    bounds = coalesce(seed_ranges)
+    for category in seed_map:
+        bounds = coalesce(sweep_category(bounds, fill_gaps(category, upper_bound)))
+    # coalesce leaves them sorted, so the lowest location is the first start.
+    return bounds[0].start if bounds else None
+
+
+def find_location_numbers(
+    seeds: Iterable[int], seed_map: SeedMap
+) -> Tuple[Union[array, List[int]], Optional[int]]:
+    """
+    batch version of find_location_number.
+    each category is one gap-filled table of starts and offsets, and the whole batch is
+    bisected into it at once. the arithmetic is on python ints, so nothing wraps.
+    :param seeds: any iterable of ints, such as an array("q").
+    :return: locations as an array("q"), or a list if any location doesn't fit in int64,
+        and the lowest location.
+    """
+    upper_bound = find_upper_bound(seed_map)
+    locations = list(seeds)
+    for category in seed_map:
+        intervals = fill_gaps(category, upper_bound)
+        starts = [interval.start for interval in intervals] + [upper_bound]
+        # bisect_right gives 0 below the table and len(intervals) past it, both map to themselves.
+        offsets = [0] + [interval.offset for interval in intervals] + [0]
+        locations = [
+            location + offsets[i]
+            for location, i in zip(locations, map(bisect_right, repeat(starts), locations))
+        ]
+
+    lowest = min(locations, default=None)
+    try:
+        return array("q", locations), lowest
+    except OverflowError:
+        return locations, lowest
+
+
+class Piece(NamedTuple):
+    # seeds in [start, end) pick up offsets[k] before category k, offsets[-1] is the total.
+    start: int
+    end: int
+    offsets: Tuple[int, ...]
+
+
+def merge_pieces(pieces: List[Piece]) -> List[Piece]:
+    # neighbours that carry the same offsets through every category are one piece.
+    merged: List[Piece] = []
+    for piece in pieces:
+        if merged and merged[-1].end == piece.start and merged[-1].offsets == piece.offsets:
+            merged[-1] = merged[-1]._replace(end=piece.end)
+        else:
+            merged.append(piece)
+    return merged
+
+
+class MutableSeedMap:
+    """
+    a SeedMap that can be edited one Map at a time.
+    every category is a list of maps sorted by source, kept next to a list of their starts,
+    so a map is found with a bisect. the same maps are also kept sorted by destination,
+    so an edited bound can be walked back to the seeds that reach it.
+    two caches hang off it, and an edit only touches the parts of them those seeds cover:
+    - the composed lookup table, as pieces of seed space that remember the offset they carry
+      into every category.
+    - the lowest location per seed range, kept in source order and bisected with the
+      longest cached range as the window.
+    maps within a category must not overlap.
+    """
+
+    def __init__(self, seed_map: SeedMap):
+        self.categories: List[List[Map]] = [
+            sorted(category, key=lambda map: map.source) for category in seed_map
+        ]
+        self.starts: List[List[int]] = [
+            [map.source for map in category] for category in self.categories
+        ]
+        self.destinations: List[List[Map]] = [
+            sorted(category, key=lambda map: map.destination) for category in seed_map
+        ]
+        self.destination_starts: List[List[int]] = [
+            [map.destination for map in category] for category in self.destinations
+        ]
+        # only ever grows, it just has to bound every map's range.
+        self.longest_map: List[int] = [
+            max((map.range for map in category), default=0) for category in seed_map
+        ]
+        self.upper_bound = find_upper_bound(seed_map)
+        self.pieces: Optional[List[Piece]] = None
+        self.piece_starts: List[int] = []
+        self.lowest: Dict[Bound, int] = {}
+        self.lowest_ranges: List[Bound] = []
+        self.longest_range = 0
+
+    @classmethod
+    def from_file(cls, filename: str):
+        return cls(SeedMap.from_file(filename))
+
+    def to_seed_map(self) -> SeedMap:
+        return SeedMap(*[list(category) for category in self.categories])
+
+    def category_index(self, category: Union[int, str]) -> int:
+        return SeedMap._fields.index(category) if isinstance(category, str) else category
+
+    def split_bound(self, index: int, start: int, end: int) -> List[Tuple[int, int, int]]:
+        # cut [start, end) along the maps of one category: (start, end, offset) per piece.
+        maps, starts = self.categories[index], self.starts[index]
+        i = bisect_right(starts, start) - 1
+        if i < 0 or maps[i].source_end <= start:
+            i += 1
+        pieces = []
+        while start < end:
+            if i < len(maps) and maps[i].source_start <= start:
+                piece_end = min(end, maps[i].source_end)
+                offset = maps[i].destination_start - maps[i].source_start
+                i += 1
+            else:
+                piece_end = end if i == len(maps) else min(end, maps[i].source_start)
+                offset = 0
+            pieces.append((start, piece_end, offset))
+            start = piece_end
+        return pieces
+
+    def compose_bound(self, start: int, end: int) -> List[Piece]:
+        pieces = [Piece(start=start, end=end, offsets=(0,))]
+        for index in range(len(self.categories)):
+            next_pieces = []
+            for piece in pieces:
+                shift = piece.offsets[-1]
+                for piece_start, piece_end, offset in self.split_bound(
+                    index, piece.start + shift, piece.end + shift
+                ):
+                    next_pieces.append(
+                        Piece(
+                            start=piece_start - shift,
+                            end=piece_end - shift,
+                            offsets=piece.offsets + (shift + offset,),
+                        )
+                    )
+            pieces = next_pieces
+        return merge_pieces(pieces)
+
+    def find_sources(self, index: int, bound: Bound) -> List[Bound]:
+        # every value that category index sends into bound.
+        sources = [
+            Bound(start=start, end=end)
+            for start, end, offset in self.split_bound(index, bound.start, bound.end)
+            if offset == 0
+        ]
+        maps, starts = self.destinations[index], self.destination_starts[index]
+        i = bisect_right(starts, bound.start - self.longest_map[index])
+        while i < len(maps) and maps[i].destination_start < bound.end:
+            map = maps[i]
+            start = max(bound.start, map.destination_start)
+            end = min(bound.end, map.destination_end)
+            if start < end:
+                offset = map.destination_start - map.source_start
+                sources.append(Bound(start=start - offset, end=end - offset))
+            i += 1
+        return sources
+
+    def find_seeds(self, index: int, bound: Bound) -> List[Bound]:
+        # the coalesced seed bounds that reach bound on their way into category index.
+        bounds = [bound]
+        for previous in reversed(range(index)):
+            bounds = coalesce(
+                [source for bound in bounds for source in self.find_sources(previous, bound)]
+            )
+        return bounds
+
+    def find_location_number(self, seed: int) -> int:
+        if self.pieces is None:
+            self.pieces = self.compose_bound(0, self.upper_bound)
+            self.piece_starts = [piece.start for piece in self.pieces]
+        i = bisect_right(self.piece_starts, seed) - 1
+        if i < 0 or seed >= self.pieces[i].end:
+            return seed
+        return seed + self.pieces[i].offsets[-1]
+
+    def get_lowest(self, seed_range: Bound) -> int:
+        if seed_range not in self.lowest:
+            pieces = self.compose_bound(seed_range.start, seed_range.end)
+            self.lowest[seed_range] = min(piece.start + piece.offsets[-1] for piece in pieces)
+            insort(self.lowest_ranges, seed_range)
+            self.longest_range = max(self.longest_range, seed_range.end - seed_range.start)
+        return self.lowest[seed_range]
+
+    def recompose(self, bound: Bound) -> None:
+        # splice fresh pieces over the ones covering bound, plus a neighbour on either side
+        # so they merge back together when the edit leaves equal offsets.
+        start, end = max(bound.start, 0), min(bound.end, self.upper_bound)
+        if start >= end:
+            return
+        first = max(bisect_right(self.piece_starts, start) - 2, 0)
+        last = min(bisect_left(self.piece_starts, end) + 1, len(self.pieces))
+        pieces = self.compose_bound(self.pieces[first].start, self.pieces[last - 1].end)
+        self.pieces[first:last] = pieces
+        self.piece_starts[first:last] = [piece.start for piece in pieces]
+
+    def invalidate(self, index: int, start: int, end: int) -> None:
+        # walk [start, end) of one category back to seed space and redo only what starts there.
+        for bound in self.find_seeds(index, Bound(start=start, end=end)):
+            window = Bound(start=bound.start - self.longest_range, end=0)
+            i = bisect_right(self.lowest_ranges, window)
+            stale = []
+            while i < len(self.lowest_ranges) and self.lowest_ranges[i].start < bound.end:
+                if bound.start < self.lowest_ranges[i].end:
+                    stale.append(i)
+                i += 1
+            for i in reversed(stale):
+                del self.lowest[self.lowest_ranges.pop(i)]
+
+            if self.pieces is not None:
+                self.recompose(bound)
+
+    def extend(self, upper_bound: int) -> None:
+        # seeds past the old upper bound went untouched until now, compose them too.
+        if upper_bound <= self.upper_bound:
+            return
+        if self.pieces is not None:
+            pieces = self.compose_bound(self.upper_bound, upper_bound)
+            pieces = merge_pieces(self.pieces[-1:] + pieces)
+            self.pieces[-1:] = pieces
+            self.piece_starts[-1:] = [piece.start for piece in pieces]
+        self.upper_bound = upper_bound
+
+    def insert(self, category: Union[int, str], map: Map) -> None:
+        index = self.category_index(category)
+        maps, starts = self.categories[index], self.starts[index]
+        i = bisect_left(starts, map.source)
+        if (i > 0 and maps[i - 1].source_end > map.source_start) or (
+            i < len(maps) and maps[i].source_start < map.source_end
+        ):
+            raise ValueError(f"{map} overlaps another map in {SeedMap._fields[index]}")
+        maps.insert(i, map)
+        starts.insert(i, map.source)
+        i = bisect_right(self.destination_starts[index], map.destination)
+        self.destinations[index].insert(i, map)
+        self.destination_starts[index].insert(i, map.destination)
+        self.longest_map[index] = max(self.longest_map[index], map.range)
+        self.invalidate(index, map.source_start, map.source_end)
+        self.extend(max(map.source_end, map.destination_end))
+
+    def remove(self, category: Union[int, str], map: Map) -> None:
+        index = self.category_index(category)
+        maps, starts = self.categories[index], self.starts[index]
+        i = bisect_left(starts, map.source)
+        if i == len(maps) or maps[i] != map:
+            raise ValueError(f"{map} is not in {SeedMap._fields[index]}")
+        del maps[i]
+        del starts[i]
+        destinations = self.destinations[index]
+        i = bisect_left(self.destination_starts[index], map.destination)
+        i = destinations.index(map, i)
+        del destinations[i]
+        del self.destination_starts[index][i]
+        self.invalidate(index, map.source_start, map.source_end)
+
+    def replace(self, category: Union[int, str], old: Map, new: Map) -> None:
+        self.remove(category, old)
+        try:
+            self.insert(category, new)
+        except ValueError:
+            self.insert(category, old)
+            raise
+
+
+# set once per worker process by init_worker, so tasks only carry their seed range.
+WORKER_SEED_MAP: Optional[SeedMap] = None
+
+
+def init_worker(seed_map: SeedMap) -> None:
+    global WORKER_SEED_MAP
+    WORKER_SEED_MAP = seed_map
+
+
+def get_lowest_in_worker(seed_range: Bound) -> int:
+    return get_lowest(seed_range=seed_range, seed_map=WORKER_SEED_MAP)
+
+
+def get_lowest_parallel(
+    seed_ranges: List[Bound],
+    seed_map: SeedMap,
+    workers: Optional[int] = None,
+    chunksize: int = 1,
+) -> Optional[int]:
+    # every range is independent, so they're fanned out and only the minima come back.
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=init_worker, initargs=(seed_map,)
+    ) as executor:
+        return min(
+            executor.map(get_lowest_in_worker, seed_ranges, chunksize=chunksize),
+            default=None,
+        )
+
+
 if __name__ == "__main__":
     filename = "data/day5"
     with open(filename, "r") as file:
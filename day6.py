@@ -1,4 +1,6 @@
-from typing import List
+from array import array
+from math import isqrt, prod
+from typing import Iterable, List, Tuple, Union
 
 
 def get_distance_ms(button_held_ms: int, race_time_ms: int) -> int:
@@ -94,6 +96,74 @@ def find_bound(
         )
 
 
+def count_ways_to_beat(race_time_ms: int, record_ms: int) -> int:
+    """
+    closed form for how many hold times beat the record, exact for any size of int.
+    hold * (time - hold) > record is a downward parabola, so the winners are the integers
+    strictly between the roots (time -/+ sqrt(time^2 - 4 * record)) / 2.
+    isqrt gets the lower root to within a step, then it's nudged onto the first winner.
+    """
+    discriminant = race_time_ms * race_time_ms - 4 * record_ms
+    if discriminant <= 0:
+        return 0
+    hold = max((race_time_ms - isqrt(discriminant)) // 2, 0)
+    while hold <= race_time_ms and get_distance_ms(hold, race_time_ms) <= record_ms:
+        hold += 1
+    while hold > 0 and get_distance_ms(hold - 1, race_time_ms) > record_ms:
+        hold -= 1
+    # the winners are symmetric around time / 2.
+    return max(race_time_ms - 2 * hold + 1, 0)
+
+
+def part1_closed_form(times: List[int], records: List[int]) -> int:
+    # same answer as part1, without building a distance_curve per race.
+    return prod(count_ways_to_beat(time, record) for time, record in zip(times, records))
+
+
+def part2_closed_form(times: List[int], records: List[int]) -> int:
+    # same answer as part2, without the recursive find_bound search.
+    time = int("".join([str(time) for time in times]))
+    record = int("".join([str(record) for record in records]))
+    return count_ways_to_beat(time, record)
+
+
+def count_ways_to_beat_batch(
+    times: Iterable[int], records: Iterable[int]
+) -> Union[array, List[int]]:
+    """
+    count_ways_to_beat for a whole table of races.
+    for a non-negative record, (time - isqrt(discriminant)) // 2 is either the last losing hold
+    or the first winning one, so a single integer check settles the boundary.
+    the math is on python ints, so it stays exact at any size, and negative records go
+    through count_ways_to_beat.
+    :return: an array("q") of counts, or a list if any count doesn't fit in int64.
+    """
+    counts = []
+    for time, record in zip(times, records):
+        if record < 0:
+            counts.append(count_ways_to_beat(time, record))
+            continue
+        discriminant = time * time - 4 * record
+        if discriminant <= 0:
+            counts.append(0)
+            continue
+        hold = (time - isqrt(discriminant)) // 2
+        if hold * (time - hold) <= record:
+            hold += 1
+        counts.append(max(time - 2 * hold + 1, 0))
+
+    try:
+        return array("q", counts)
+    except OverflowError:
+        return counts
+
+
+def score_races(times: Iterable[int], records: Iterable[int]) -> Tuple[int, int]:
+    # product (the part1 answer) and sum of the ways to beat every race.
+    counts = count_ways_to_beat_batch(times, records)
+    return prod(counts), sum(counts)
+
+
 if __name__ == "__main__":
     filename = "data/day6"
     with open(filename, "r") as file:
@@ -1,5 +1,8 @@
+import heapq
+import struct
+import tempfile
 from collections import Counter
-from typing import Dict, List, NamedTuple, Optional
+from typing import BinaryIO, Dict, Iterator, List, NamedTuple, Optional, Tuple
 
 
 class HandTypes(NamedTuple):
@@ -12,6 +15,32 @@ class HandTypes(NamedTuple):
     high_card: List[str]
 
 
+# sorted card counts -> type rank, the reverse of the HandTypes order so stronger is bigger.
+TYPE_RANKS: Dict[Tuple[int, ...], int] = {
+    (5,): 6,
+    (4, 1): 5,
+    (3, 2): 4,
+    (3, 1, 1): 3,
+    (2, 2, 1): 2,
+    (2, 1, 1, 1): 1,
+    (1, 1, 1, 1, 1): 0,
+}
+CARD_BITS = 4
+# TYPE_RANKS only knows 5 card hands.
+HAND_SIZE = 5
+
+# fixed width (key, bid) records for the external sort, the bid is signed.
+RECORD = struct.Struct("<Qq")
+BID_BITS = 64
+# in memory a record is one int, key in the high bits and bid + BID_BIAS in the low ones,
+# so it sorts by key and then by signed bid.
+BID_BIAS = 1 << (BID_BITS - 1)
+# rough bytes held in memory per record while a run is sorted: the packed int and its list slot.
+RECORD_MEMORY = 48
+# most runs merged at once, so the number of open temp files stays bounded.
+MERGE_FAN_IN = 64
+
+
 def sort_hands(hands, rank_order: str, wildcard: str = None) -> HandTypes:
     types = {key: [] for key in HandTypes._fields}
     checks = {
@@ -111,6 +140,246 @@ def evaluate_plays(
     return score(hand_types)
 
 
+def hand_type_rank(hand: str, wildcard: Optional[str] = None) -> int:
+    # the type sort_hands would bucket the hand into, read off its count signature.
+    jokers = hand.count(wildcard) if wildcard else 0
+    if jokers:
+        hand = hand.replace(wildcard, "")
+    counts = sorted(map(hand.count, set(hand)), reverse=True) or [0]
+    # like optimize_wildcard_outcome, the jokers join the biggest group.
+    counts[0] += jokers
+    return TYPE_RANKS[tuple(counts)]
+
+
+def card_table(rank_order: str) -> Dict[int, str]:
+    # str.translate table turning every card into one hex digit, bigger is stronger.
+    return {
+        ord(card): "0123456789abcdef"[len(rank_order) - 1 - i]
+        for i, card in enumerate(rank_order)
+    }
+
+
+def encode_hand(hand: str, table: Dict[int, str], wildcard: Optional[str] = None) -> int:
+    """
+    one integer that sorts the same way sort_hands and ranking do:
+    the type rank in the high bits, then every card as a 4 bit nibble in hand order.
+    """
+    cards = int(hand.translate(table), 16)
+    return (hand_type_rank(hand, wildcard=wildcard) << (CARD_BITS * len(hand))) | cards
+
+
+def evaluate_plays_encoded(
+    plays: Dict[str, int], rank_order: str, wildcard: Optional[str] = None
+) -> int:
+    # same answer as evaluate_plays, with a single sort on integer keys.
+    table = card_table(rank_order)
+    ranked = sorted(
+        (encode_hand(hand, table, wildcard=wildcard), bid) for hand, bid in plays.items()
+    )
+    return sum(rank * bid for rank, (_, bid) in enumerate(ranked, start=1))
+
+
+def write_run(records: List[int], buffer_records: int) -> BinaryIO:
+    records.sort()
+    run = tempfile.TemporaryFile()
+    mask = (1 << BID_BITS) - 1
+    # packed a slice at a time, so the bytes never hold a second copy of the whole run.
+    for i in range(0, len(records), buffer_records):
+        run.write(
+            b"".join(
+                RECORD.pack(record >> BID_BITS, (record & mask) - BID_BIAS)
+                for record in records[i : i + buffer_records]
+            )
+        )
+    run.seek(0)
+    return run
+
+
+def read_run(run: BinaryIO, buffer_records: int) -> Iterator[Tuple[int, int]]:
+    while True:
+        chunk = run.read(RECORD.size * buffer_records)
+        if not chunk:
+            return
+        yield from RECORD.iter_unpack(chunk)
+
+
+def merge_runs(runs: List[BinaryIO], buffer_records: int) -> BinaryIO:
+    merged_run = tempfile.TemporaryFile()
+    for record in heapq.merge(*(read_run(run, buffer_records) for run in runs)):
+        merged_run.write(RECORD.pack(*record))
+    merged_run.seek(0)
+    for run in runs:
+        run.close()
+    return merged_run
+
+
+def score_file_external(
+    filename: str,
+    rank_order: str,
+    wildcard: Optional[str] = None,
+    memory_budget: int = 1 << 26,
+) -> int:
+    """
+    same answer as evaluate_plays for play files that don't fit in memory, and every play
+    counts, even when the same hand shows up twice with different bids.
+    hands are encoded as they're read, sorted in runs that fit the memory budget and
+    spilled to temp files, then the runs are merged while the winnings are added up.
+    bids must fit in a signed 64 bit int, or ValueError is raised.
+    :param memory_budget: roughly how many bytes of records to hold at once.
+    """
+    table = card_table(rank_order)
+    run_records = max(memory_budget // RECORD_MEMORY, 1)
+    buffer_records = max(run_records // MERGE_FAN_IN, 1)
+    runs: List[BinaryIO] = []
+    records: List[int] = []
+    try:
+        with open(filename, "r") as file:
+            for line in file:
+                if not line.strip():
+                    continue
+                hand, bid = line.split()
+                key = encode_hand(hand, table, wildcard=wildcard)
+                bid = int(bid)
+                if not -BID_BIAS <= bid < BID_BIAS:
+                    raise ValueError(f"bid {bid} for {hand} doesn't fit in {BID_BITS} bits")
+                records.append((key << BID_BITS) | (bid + BID_BIAS))
+                if len(records) == run_records:
+                    runs.append(write_run(records, buffer_records))
+                    records = []
+        if records:
+            runs.append(write_run(records, buffer_records))
+            records = []
+
+        while len(runs) > MERGE_FAN_IN:
+            runs.append(merge_runs(runs[:MERGE_FAN_IN], buffer_records))
+            del runs[:MERGE_FAN_IN]
+        merged = heapq.merge(*(read_run(run, buffer_records) for run in runs))
+        return sum(rank * bid for rank, (_, bid) in enumerate(merged, start=1))
+    finally:
+        for run in runs:
+            run.close()
+
+
+class BidTree:
+    """
+    a sparse fenwick tree over every signed 64 bit bid, for the repeats of one hand.
+    nodes live in dicts, so it only costs the paths of the bids actually in it, and an
+    update or query takes at most BID_BITS steps however many repeats there are.
+    """
+
+    def __init__(self):
+        self.size = 1 << BID_BITS
+        self.counts: Dict[int, int] = {}
+        self.bids: Dict[int, int] = {}
+
+    def add(self, bid: int, count: int) -> None:
+        i = bid + BID_BIAS + 1
+        while i <= self.size:
+            self.counts[i] = self.counts.get(i, 0) + count
+            self.bids[i] = self.bids.get(i, 0) + count * bid
+            i += i & -i
+
+    def at_most(self, bid: int) -> Tuple[int, int]:
+        # repeats and their bid sum for every bid up to and including bid.
+        count, bids = 0, 0
+        i = bid + BID_BIAS + 1
+        while i > 0:
+            count += self.counts.get(i, 0)
+            bids += self.bids.get(i, 0)
+            i -= i & -i
+        return count, bids
+
+
+class Leaderboard:
+    """
+    live total winnings while plays are added and removed, under one rule set.
+    build one with rank_order="AKQJT98765432" for the plain rules and another with
+    rank_order="AKQT98765432J", wildcard="J" for the joker rules.
+    hands are numbered densely in the same order evaluate_plays_encoded sorts them, and two
+    fenwick trees over those numbers keep the play count and bid sum below any hand, so an
+    insert or remove only adjusts its own rank and the bids ranked above it.
+    the trees are sparse dicts of python ints, so they only cost the paths of the hands in
+    play and no sum can overflow.
+    repeats of the same hand are ordered by bid, like evaluate_plays_encoded, with a
+    BidTree per hand so many repeats stay logarithmic too. bids must fit in a signed
+    64 bit int.
+    """
+
+    def __init__(self, rank_order: str, wildcard: Optional[str] = None):
+        self.table = card_table(rank_order)
+        self.wildcard = wildcard
+        self.base = len(rank_order)
+        self.size = len(TYPE_RANKS) * self.base**HAND_SIZE
+        # fenwick trees, 1-indexed.
+        self.counts: Dict[int, int] = {}
+        self.bids: Dict[int, int] = {}
+        # bids per hand, for the hands that are in play.
+        self.hand_bids: Dict[int, BidTree] = {}
+        self.total_bids = 0
+        self.winnings = 0
+
+    def position(self, hand: str) -> int:
+        if len(hand) != HAND_SIZE:
+            raise ValueError(f"{hand} is not {HAND_SIZE} cards")
+        cards = int(hand.translate(self.table), self.base)
+        return hand_type_rank(hand, wildcard=self.wildcard) * self.base**HAND_SIZE + cards
+
+    def add(self, position: int, count: int, bid: int) -> None:
+        i = position + 1
+        while i <= self.size:
+            self.counts[i] = self.counts.get(i, 0) + count
+            self.bids[i] = self.bids.get(i, 0) + bid
+            i += i & -i
+
+    def below(self, position: int) -> Tuple[int, int]:
+        # plays and bid sum for every hand strictly weaker than position.
+        count, bids = 0, 0
+        i = position
+        while i > 0:
+            count += self.counts.get(i, 0)
+            bids += self.bids.get(i, 0)
+            i -= i & -i
+        return count, bids
+
+    def rank_play(self, position: int, bid: int) -> int:
+        # what a play of bid at position adds to the winnings of everything else in play.
+        weaker, weaker_bids = self.below(position)
+        tree = self.hand_bids.get(position)
+        j, at_most_bids = tree.at_most(bid) if tree else (0, 0)
+        # repeats with bigger bids and every stronger hand move up one, their bids are
+        # whatever isn't weaker or a repeat up to bid.
+        stronger_bids = self.total_bids - weaker_bids - at_most_bids
+        return (weaker + j + 1) * bid + stronger_bids
+
+    def insert(self, hand: str, bid: int) -> int:
+        position = self.position(hand)
+        if not -BID_BIAS <= bid < BID_BIAS:
+            raise ValueError(f"bid {bid} for {hand} doesn't fit in {BID_BITS} bits")
+        # this play lands at weaker + j + 1.
+        self.winnings += self.rank_play(position, bid)
+
+        self.hand_bids.setdefault(position, BidTree()).add(bid, 1)
+        self.add(position, 1, bid)
+        self.total_bids += bid
+        return self.winnings
+
+    def remove(self, hand: str, bid: int) -> int:
+        position = self.position(hand)
+        tree = self.hand_bids.get(position)
+        if tree is None or not -BID_BIAS <= bid < BID_BIAS:
+            raise KeyError((hand, bid))
+        if tree.at_most(bid)[0] == tree.at_most(bid - 1)[0]:
+            raise KeyError((hand, bid))
+        tree.add(bid, -1)
+        self.add(position, -1, -bid)
+        self.total_bids -= bid
+        if self.below(position + 1)[0] == self.below(position)[0]:
+            del self.hand_bids[position]
+
+        self.winnings -= self.rank_play(position, bid)
+        return self.winnings
+
+
 if __name__ == "__main__":
     filename = "data/day7"
     with open(filename, "r") as file:
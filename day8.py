@@ -1,6 +1,10 @@
-from typing import Dict, List
+import pickle
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
 from copy import deepcopy
-from math import lcm
+from math import gcd, lcm
 
 
 def create_node(node: str) -> Dict[str, Dict[str, str]]:
@@ -74,6 +78,445 @@ def find_destinations_simultaneously(
     return lcm(*z_positions)
 
 
+class CompiledGraph(NamedTuple):
+    """
+    the graph with node names interned into dense ids, so a hop is one array lookup.
+    moves[instruction][node] is the next node, where instruction is 0 for L and 1 for R,
+    and instructions holds one of those per step, read with a modulo index.
+    """
+
+    names: List[str]
+    ids: Dict[str, int]
+    moves: List[array]
+    instructions: bytes
+
+    @classmethod
+    def compile(cls, graph: Dict[str, Dict[str, str]], instructions: Iterable[str]):
+        names = list(graph.keys())
+        ids = {name: i for i, name in enumerate(names)}
+        moves = [
+            array("q", [ids[graph[name][direction]] for name in names])
+            for direction in "LR"
+        ]
+        return cls(
+            names=names,
+            ids=ids,
+            moves=moves,
+            instructions=bytes("LR".index(instruction) for instruction in instructions),
+        )
+
+
+def find_destination_compiled(
+    compiled: CompiledGraph, source: str = "AAA", destination: str = "ZZZ"
+) -> int:
+    # aka part 1, on the compiled graph.
+    left, right = compiled.moves
+    instructions = compiled.instructions
+    current_node = compiled.ids[source]
+    target = compiled.ids[destination]
+    steps = 0
+    while current_node != target:
+        moves = right if instructions[steps % len(instructions)] else left
+        current_node = moves[current_node]
+        steps += 1
+    return steps
+
+
+def find_destinations_simultaneously_compiled(
+    compiled: CompiledGraph, source: str = "A", destination: str = "Z"
+) -> int:
+    # aka part 2, on the compiled graph. like the original, each origin stops at its first Z.
+    left, right = compiled.moves
+    instructions = compiled.instructions
+    is_destination = bytes(name.endswith(destination) for name in compiled.names)
+
+    z_positions = []
+    for origin, name in enumerate(compiled.names):
+        if not name.endswith(source):
+            continue
+        current_node = origin
+        steps = 0
+        while not is_destination[current_node]:
+            moves = right if instructions[steps % len(instructions)] else left
+            current_node = moves[current_node]
+            steps += 1
+        z_positions.append(steps)
+
+    return lcm(*z_positions)
+
+
+class GhostCycle(NamedTuple):
+    # a walk over (node, instruction offset) states always ends up looping.
+    tail: int  # steps taken before the loop starts
+    length: int  # steps around the loop
+    tail_hits: List[int]  # steps before the loop that land on a destination
+    cycle_hits: List[int]  # steps in [tail, tail + length) that land on a destination
+    residues: FrozenSet[int]  # cycle_hits modulo length
+
+    def hits(self, steps: int) -> bool:
+        if steps < self.tail:
+            return steps in self.tail_hits
+        return steps % self.length in self.residues
+
+
+def find_cycle(compiled: CompiledGraph, origin: int, is_destination: bytes) -> GhostCycle:
+    """
+    brent's cycle detection over (node, instruction offset) states, so nothing but the
+    destination hits is kept, however long the loop is.
+    """
+    left, right = compiled.moves
+    instructions = compiled.instructions
+    size = len(instructions)
+
+    # length of the loop: the hare runs ahead in powers of two until it meets the tortoise.
+    power = length = 1
+    tortoise_node, tortoise_offset = origin, 0
+    hare_node = (right if instructions[0] else left)[origin]
+    hare_offset = 1 % size
+    while (tortoise_node, tortoise_offset) != (hare_node, hare_offset):
+        if power == length:
+            tortoise_node, tortoise_offset = hare_node, hare_offset
+            power *= 2
+            length = 0
+        hare_node = (right if instructions[hare_offset] else left)[hare_node]
+        hare_offset = (hare_offset + 1) % size
+        length += 1
+
+    # length of the tail: start the hare a full loop ahead and walk both until they meet.
+    hare_node, hare_offset = origin, 0
+    for _ in range(length):
+        hare_node = (right if instructions[hare_offset] else left)[hare_node]
+        hare_offset = (hare_offset + 1) % size
+    tortoise_node, tortoise_offset = origin, 0
+    tail = 0
+    while (tortoise_node, tortoise_offset) != (hare_node, hare_offset):
+        tortoise_node = (right if instructions[tortoise_offset] else left)[tortoise_node]
+        tortoise_offset = (tortoise_offset + 1) % size
+        hare_node = (right if instructions[hare_offset] else left)[hare_node]
+        hare_offset = (hare_offset + 1) % size
+        tail += 1
+
+    tail_hits, cycle_hits = [], []
+    node = origin
+    for steps in range(tail + length):
+        if is_destination[node]:
+            (tail_hits if steps < tail else cycle_hits).append(steps)
+        node = (right if instructions[steps % size] else left)[node]
+    return GhostCycle(
+        tail=tail,
+        length=length,
+        tail_hits=tail_hits,
+        cycle_hits=cycle_hits,
+        residues=frozenset(hit % length for hit in cycle_hits),
+    )
+
+
+def combine_congruences(
+    first: Tuple[int, int], second: Tuple[int, int]
+) -> Optional[Tuple[int, int]]:
+    # generalized chinese remainder: (residue, modulus) pairs that needn't be coprime.
+    residue, modulus = first
+    other_residue, other_modulus = second
+    divisor = gcd(modulus, other_modulus)
+    if (other_residue - residue) % divisor:
+        return None
+    step = other_modulus // divisor
+    k = (other_residue - residue) // divisor * pow(modulus // divisor, -1, step) % step
+    combined_modulus = modulus * step
+    return (residue + modulus * k) % combined_modulus, combined_modulus
+
+
+def earliest_common_step(cycles: List[GhostCycle]) -> Optional[int]:
+    """
+    the first step where every walk is on a destination at once, or None if that never happens.
+    """
+    start = max(cycle.tail for cycle in cycles)
+
+    # before every walk is in its loop, check the first walk's hits one by one.
+    first = cycles[0]
+    early_hits = sorted(
+        {hit for hit in first.tail_hits if hit < start}
+        | {
+            steps
+            for hit in first.cycle_hits
+            for steps in range(hit, start, first.length)
+        }
+    )
+    for steps in early_hits:
+        if all(cycle.hits(steps) for cycle in cycles):
+            return steps
+
+    # the simple structure: every walk only lands on a destination at multiples of its loop.
+    if all(cycle.residues == {0} for cycle in cycles):
+        modulus = lcm(*(cycle.length for cycle in cycles))
+        return -(-start // modulus) * modulus
+
+    # fold the walks in one at a time, every partial congruence shares the same modulus,
+    # so duplicates collapse and the set stays at most that modulus in size.
+    congruences = {(0, 1)}
+    for cycle in cycles:
+        congruences = {
+            combined
+            for congruence in congruences
+            for residue in cycle.residues
+            for combined in [combine_congruences(congruence, (residue, cycle.length))]
+            if combined is not None
+        }
+        if not congruences:
+            return None
+
+    # lift each residue to the first matching step once every walk is looping.
+    return min(
+        residue + max(-(-(start - residue) // modulus), 0) * modulus
+        for residue, modulus in congruences
+    )
+
+
+def find_destinations_cycles(
+    compiled: CompiledGraph, source: str = "A", destination: str = "Z"
+) -> Optional[int]:
+    """
+    aka part 2, without assuming each walk loops right back onto its first destination.
+    every origin's loop and destination hits are found first, then lined up.
+    """
+    is_destination = bytes(name.endswith(destination) for name in compiled.names)
+    cycles = [
+        find_cycle(compiled, origin, is_destination)
+        for origin, name in enumerate(compiled.names)
+        if name.endswith(source)
+    ]
+    return earliest_common_step(cycles) if cycles else None
+
+
+class PassTable:
+    """
+    where every node ends up after one full pass of the instructions, and the first step of
+    that pass (if any) standing on a destination. doubling tables on top of it answer
+    questions about trillions of steps in O(log N) passes plus at most one partial pass.
+    building it walks every node through one pass, so it's linear in nodes x instructions.
+    """
+
+    def __init__(self, compiled: CompiledGraph, destination: str = "Z"):
+        self.compiled = compiled
+        self.is_destination = bytes(name.endswith(destination) for name in compiled.names)
+        left, right = compiled.moves
+
+        nodes = list(range(len(compiled.names)))
+        first_hits = [-1] * len(nodes)
+        for offset, instruction in enumerate(compiled.instructions):
+            first_hits = [
+                offset if hit < 0 and self.is_destination[node] else hit
+                for hit, node in zip(first_hits, nodes)
+            ]
+            moves = right if instruction else left
+            nodes = [moves[node] for node in nodes]
+
+        # jumps[k][node] is the node after 2^k passes, first_hits[k][node] the first
+        # destination step within those passes or -1.
+        self.jumps: List[array] = [array("q", nodes)]
+        self.first_hits: List[array] = [array("q", first_hits)]
+
+    def add_level(self) -> None:
+        jump, first_hit = self.jumps[-1], self.first_hits[-1]
+        span = len(self.compiled.instructions) << (len(self.jumps) - 1)
+        self.jumps.append(array("q", [jump[node] for node in jump]))
+        # a hit in the first half wins, otherwise look in the half starting at middle.
+        self.first_hits.append(
+            array(
+                "q",
+                [
+                    hit if hit >= 0 or first_hit[middle] < 0 else first_hit[middle] + span
+                    for hit, middle in zip(first_hit, jump)
+                ],
+            )
+        )
+
+    def position_after(self, source: str, steps: int) -> str:
+        # the node reached after taking steps instructions from source.
+        if steps < 0:
+            raise ValueError(f"steps must be at least 0, got {steps}")
+        passes, remainder = divmod(steps, len(self.compiled.instructions))
+        while passes.bit_length() > len(self.jumps):
+            self.add_level()
+        node = self.compiled.ids[source]
+        level = 0
+        while passes:
+            if passes & 1:
+                node = self.jumps[level][node]
+            passes >>= 1
+            level += 1
+
+        left, right = self.compiled.moves
+        for instruction in self.compiled.instructions[:remainder]:
+            node = (right if instruction else left)[node]
+        return self.compiled.names[node]
+
+    def steps_to_destination(self, source: str) -> Optional[int]:
+        """
+        steps from source until the first destination, 0 if source already is one.
+        None if it's never reached: the pass to pass walk has to loop within one pass per
+        node, so the search never needs more than that many passes.
+        """
+        while 1 << (len(self.jumps) - 1) < len(self.compiled.names):
+            self.add_level()
+        node = self.compiled.ids[source]
+        passes = 0
+        for level in reversed(range(len(self.jumps))):
+            if self.first_hits[level][node] < 0:
+                node = self.jumps[level][node]
+                passes += 1 << level
+        if self.first_hits[0][node] < 0:
+            return None
+        return passes * len(self.compiled.instructions) + self.first_hits[0][node]
+
+
+class DestinationIndex(NamedTuple):
+    """
+    for every (node, instruction offset) state, the steps to the next destination node and
+    which node that is, so a query is a single array lookup.
+    states are numbered offset * len(names) + node, and unreachable ones hold -1.
+    """
+
+    compiled: CompiledGraph
+    destination: str
+    distances: array
+    targets: array
+
+    @classmethod
+    def build(cls, compiled: CompiledGraph, destination: str = "Z"):
+        """
+        every state has exactly one successor, so follow successors from each unsolved state
+        until one is solved, then hand the answer back down the path that led there.
+        a path that runs into itself without meeting a destination never will.
+        each state is walked over once and solved once.
+        """
+        node_count = len(compiled.names)
+        instructions = compiled.instructions
+        state_count = node_count * len(instructions)
+        is_destination = [name.endswith(destination) for name in compiled.names]
+        distances = array("q", [-1]) * state_count
+        targets = array("q", [-1]) * state_count
+        # 0 unseen, 1 on the current path, 2 solved.
+        status = bytearray(state_count)
+
+        for state in range(state_count):
+            path = []
+            while not status[state]:
+                offset, node = divmod(state, node_count)
+                if is_destination[node]:
+                    distances[state], targets[state] = 0, node
+                    status[state] = 2
+                    break
+                status[state] = 1
+                path.append(state)
+                node = compiled.moves[instructions[offset]][node]
+                state = (offset + 1) % len(instructions) * node_count + node
+
+            distance, target = distances[state], targets[state]
+            for state in reversed(path):
+                if distance >= 0:
+                    distance += 1
+                distances[state], targets[state] = distance, target
+                status[state] = 2
+        return cls(
+            compiled=compiled,
+            destination=destination,
+            distances=distances,
+            targets=targets,
+        )
+
+    @classmethod
+    def load(cls, filename: str):
+        with open(filename, "rb") as file:
+            compiled, destination, distances, targets = pickle.load(file)
+        return cls(
+            compiled=CompiledGraph(*compiled),
+            destination=destination,
+            distances=distances,
+            targets=targets,
+        )
+
+    def save(self, filename: str) -> None:
+        with open(filename, "wb") as file:
+            pickle.dump(
+                (tuple(self.compiled), self.destination, self.distances, self.targets), file
+            )
+
+    def find(self, source: str, offset: int = 0) -> Optional[Tuple[int, str]]:
+        # steps from source at instruction offset to the next destination, and its name.
+        state = offset % len(self.compiled.instructions) * len(self.compiled.names)
+        state += self.compiled.ids[source]
+        if self.distances[state] < 0:
+            return None
+        return self.distances[state], self.compiled.names[self.targets[state]]
+
+
+# set once per worker process by init_worker, views straight into the parent's shared block.
+WORKER_MEMORY: Optional[shared_memory.SharedMemory] = None
+WORKER_GRAPH: Optional[CompiledGraph] = None
+WORKER_DESTINATIONS: Optional[memoryview] = None
+
+
+def init_worker(name: str, node_count: int, instruction_count: int) -> None:
+    global WORKER_MEMORY, WORKER_GRAPH, WORKER_DESTINATIONS
+    WORKER_MEMORY = shared_memory.SharedMemory(name=name)
+    buffer = WORKER_MEMORY.buf
+    moves_size = 8 * node_count
+    instructions_end = 2 * moves_size + instruction_count
+    # find_cycle only needs the moves and instructions, names stay with the parent.
+    WORKER_GRAPH = CompiledGraph(
+        names=[],
+        ids={},
+        moves=[
+            buffer[:moves_size].cast("q"),
+            buffer[moves_size : 2 * moves_size].cast("q"),
+        ],
+        instructions=buffer[2 * moves_size : instructions_end],
+    )
+    WORKER_DESTINATIONS = buffer[instructions_end : instructions_end + node_count]
+
+
+def find_cycle_in_worker(origin: int) -> GhostCycle:
+    return find_cycle(WORKER_GRAPH, origin, WORKER_DESTINATIONS)
+
+
+def find_destinations_parallel(
+    compiled: CompiledGraph,
+    source: str = "A",
+    destination: str = "Z",
+    workers: Optional[int] = None,
+    chunksize: int = 1,
+) -> Optional[int]:
+    """
+    find_destinations_cycles with the origins fanned out over a process pool.
+    the moves, instructions and destination flags are copied into one shared memory block,
+    so tasks only carry an origin id and only the cycle summaries come back.
+    """
+    node_count = len(compiled.names)
+    origins = [i for i, name in enumerate(compiled.names) if name.endswith(source)]
+    if not origins:
+        return None
+    is_destination = bytes(name.endswith(destination) for name in compiled.names)
+    left, right = compiled.moves
+    data = b"".join(
+        [left.tobytes(), right.tobytes(), compiled.instructions, is_destination]
+    )
+
+    memory = shared_memory.SharedMemory(create=True, size=len(data))
+    try:
+        memory.buf[: len(data)] = data
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=init_worker,
+            initargs=(memory.name, node_count, len(compiled.instructions)),
+        ) as executor:
+            cycles = list(executor.map(find_cycle_in_worker, origins, chunksize=chunksize))
+    finally:
+        memory.close()
+        memory.unlink()
+    return earliest_common_step(cycles)
+
+
 def main():
     filename = "data/day8"
     with open(filename, "r") as file:
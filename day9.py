@@ -1,4 +1,7 @@
-from typing import List
+from collections import defaultdict
+from functools import lru_cache
+from math import comb
+from typing import Dict, List, Tuple
 
 
 def get_sequence_differences(sequence: List[int]) -> List[int]:
@@ -10,7 +13,8 @@ def get_sequence_differences(sequence: List[int]) -> List[int]:
 
 
 def create_sequence_cluster(sequence: List[int]) -> List[List[int]]:
-    sequence_cluster = [sequence]
+    # copied, so the predictions below don't extend the caller's sequence.
+    sequence_cluster = [list(sequence)]
     while not all(element == 0 for element in sequence_cluster[-1]):
         sequence_cluster.append(get_sequence_differences(sequence_cluster[-1]))
     return sequence_cluster
@@ -55,6 +59,38 @@ def oasis_extrapolator(sequences: List[List[int]]) -> int:
     return total
 
 
+@lru_cache(maxsize=None)
+def extrapolation_weights(length: int) -> Tuple[Tuple[int, ...], Tuple[int, ...]]:
+    """
+    the difference pyramid is linear in the sequence, so both predictions are fixed
+    alternating binomial weightings of the values:
+    next = sum((-1)^(n-1-i) * C(n, i) * a_i), previous = sum((-1)^i * C(n, i+1) * a_i)
+    """
+    next_weights = tuple((-1) ** (length - 1 - i) * comb(length, i) for i in range(length))
+    previous_weights = tuple((-1) ** i * comb(length, i + 1) for i in range(length))
+    return next_weights, previous_weights
+
+
+def extrapolate_all(sequences: List[List[int]]) -> Tuple[int, int]:
+    """
+    same answers as oasis and oasis_extrapolator, without building a pyramid or touching
+    the sequences. sequences of the same length share their weights, so each group is one
+    weighted sum over its column totals. python ints keep it exact however big it gets.
+    :return: sum of the next values, sum of the previous values
+    """
+    by_length: Dict[int, List[List[int]]] = defaultdict(list)
+    for sequence in sequences:
+        by_length[len(sequence)].append(sequence)
+
+    next_total, previous_total = 0, 0
+    for length, group in by_length.items():
+        next_weights, previous_weights = extrapolation_weights(length)
+        column_totals = list(map(sum, zip(*group)))
+        next_total += sum(map(int.__mul__, next_weights, column_totals))
+        previous_total += sum(map(int.__mul__, previous_weights, column_totals))
+    return next_total, previous_total
+
+
 def main():
     filename = "data/day9"
     with open(filename, "r") as file: